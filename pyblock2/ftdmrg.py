@@ -45,6 +45,34 @@ else:
     from block2.sz import MovingEnvironment, TimeEvolution, Expect, IdentityMPO, Linear
 
 
+# FCIDUMP (molpro) irrep -> XOR irrep for d2h and subgroups,
+# PointGroup.swap_d2h is only defined for 0 <= isym <= 8
+_D2H_SWAP = np.fromiter((PointGroup.swap_d2h(i) for i in range(9)), dtype=np.uint8)
+
+
+def _zero_small(x, tol, chunk=1 << 20):
+    """Set entries of 1D array x below tol to zero in place, chunk by chunk."""
+    absbuf = np.empty(min(chunk, x.size), dtype=x.dtype)
+    mask = np.empty(min(chunk, x.size), dtype=bool)
+    for i in range(0, x.size, chunk):
+        xx = x[i:i + chunk]
+        xabs, xmask = absbuf[:xx.size], mask[:xx.size]
+        np.abs(xx, out=xabs)
+        np.less(xabs, tol, out=xmask)
+        np.copyto(xx, 0.0, where=xmask)
+    return x
+
+
+def _pack_sym_tri(h, n_sites, tol, tril):
+    """Pack the lower triangle (tril) of the symmetric n_sites x n_sites block of h,
+    zeroing entries below tol."""
+    hs = h[:n_sites, :n_sites]
+    assert np.allclose(hs, hs.T, rtol=0.0, atol=tol)
+    mh = np.ascontiguousarray(hs[tril], dtype=np.float64)
+    mh[np.abs(mh) < tol] = 0.0
+    return mh
+
+
 class FTDMRGError(Exception):
     pass
 
@@ -54,83 +82,80 @@ class FTDMRG:
     Finite-temperature DMRG for molecules.
     """
 
-    def __init__(self, scratch='./nodex', memory=1 * 1E9, omp_threads=2, verbose=2):
+    def __init__(self, scratch='./nodex', memory=1 * 1E9, omp_threads=2, verbose=2, seq_type=None):
 
         Random.rand_seed(0)
         init_memory(isize=int(memory * 0.1),
                     dsize=int(memory * 0.9), save_dir=scratch)
         Global.threading = Threading(
             ThreadingTypes.OperatorBatchedGEMM | ThreadingTypes.Global, omp_threads, omp_threads, 1)
-        Global.threading.seq_type = SeqTypes.Tasked
+        if seq_type is None:
+            # task scheduling only pays off with more than one thread
+            seq_type = SeqTypes.Tasked if omp_threads > 1 else SeqTypes.Simple
+        Global.threading.seq_type = seq_type
         Global.frame.use_main_stack = False
         self.fcidump = None
         self.hamil = None
+        self.mps_info = None
         self.verbose = verbose
+        # simplified MPOs as (key, mpo) in creation order,
+        # released newest first (block2 stack memory)
+        self.mpo_cache = []
+        self.bond_dims_cache = {}
 
     def init_hamiltonian_fcidump(self, pg, filename):
         assert self.fcidump is None
         self.fcidump = FCIDUMP()
         self.fcidump.read(filename)
         self.orb_sym = VectorUInt8(
-            map(PointGroup.swap_d2h, self.fcidump.orb_sym))
+            _D2H_SWAP[np.array(self.fcidump.orb_sym, dtype=np.uint8)])
         n_elec = self.fcidump.n_sites * 2
 
         vacuum = SpinLabel(0)
         self.target = SpinLabel(n_elec, 0, # twos is 0 for a thermal state; n_elec = n_sites
-                                PointGroup.swap_d2h(self.fcidump.isym))
+                                int(_D2H_SWAP[self.fcidump.isym]))
         self.n_physical_sites = self.fcidump.n_sites
         self.n_sites = self.fcidump.n_sites * 2
 
         self.hamil = HamiltonianQC(
             vacuum, self.n_physical_sites, self.orb_sym, self.fcidump)
+        # shared by all phases with a single ancilla MPS; only the tag changes
+        self.mps_info = AncillaMPSInfo(self.n_physical_sites, self.hamil.vacuum,
+                                       self.target, self.hamil.basis)
         assert pg in ["d2h", "c1"]
 
     def init_hamiltonian(self, pg, n_sites, twos, isym, orb_sym, e_core, h1e, g2e, tol=1E-13, save_fcidump=None):
         assert self.fcidump is None
         self.fcidump = FCIDUMP()
         n_elec = n_sites * 2
+        tril = np.tril_indices(n_sites)
         if not isinstance(h1e, tuple):
-            mh1e = np.zeros((n_sites * (n_sites + 1) // 2))
-            k = 0
-            for i in range(0, n_sites):
-                for j in range(0, i + 1):
-                    assert abs(h1e[i, j] - h1e[j, i]) < tol
-                    mh1e[k] = h1e[i, j]
-                    k += 1
-            mg2e = g2e.flatten()
-            mh1e[np.abs(mh1e) < tol] = 0.0
-            mg2e[np.abs(mg2e) < tol] = 0.0
+            mh1e = _pack_sym_tri(h1e, n_sites, tol, tril)
+            mg2e = _zero_small(
+                np.array(g2e, dtype=np.float64, order='C').ravel(), tol)
             self.fcidump.initialize_su2(
                 n_sites, n_elec, twos, isym, e_core, mh1e, mg2e)
         else:
             assert SpinLabel == SZ
             assert isinstance(h1e, tuple) and len(h1e) == 2
             assert isinstance(g2e, tuple) and len(g2e) == 3
-            mh1e_a = np.zeros((n_sites * (n_sites + 1) // 2))
-            mh1e_b = np.zeros((n_sites * (n_sites + 1) // 2))
-            mh1e = (mh1e_a, mh1e_b)
-            for xmh1e, xh1e in zip(mh1e, h1e):
-                k = 0
-                for i in range(0, n_sites):
-                    for j in range(0, i + 1):
-                        assert abs(xh1e[i, j] - xh1e[j, i]) < tol
-                        xmh1e[k] = xh1e[i, j]
-                        k += 1
-                xmh1e[np.abs(xmh1e) < tol] = 0.0
-            mg2e = tuple(xg2e.flatten() for xg2e in g2e)
-            for xmg2e in mg2e:
-                xmg2e[np.abs(xmg2e) < tol] = 0.0
+            mh1e = tuple(_pack_sym_tri(xh1e, n_sites, tol, tril) for xh1e in h1e)
+            mg2e = tuple(_zero_small(
+                np.array(xg2e, dtype=np.float64, order='C').ravel(), tol) for xg2e in g2e)
             self.fcidump.initialize_sz(
                 n_sites, n_elec, twos, isym, e_core, mh1e, mg2e)
-        self.orb_sym = VectorUInt8(map(PointGroup.swap_d2h, orb_sym))
+        self.orb_sym = VectorUInt8(_D2H_SWAP[np.array(orb_sym, dtype=np.uint8)])
 
         vacuum = SpinLabel(0)
-        self.target = SpinLabel(n_elec, 0, PointGroup.swap_d2h(isym))
+        self.target = SpinLabel(n_elec, 0, int(_D2H_SWAP[isym]))
         self.n_physical_sites = n_sites
         self.n_sites = n_sites * 2
 
         self.hamil = HamiltonianQC(
             vacuum, self.n_physical_sites, self.orb_sym, self.fcidump)
+        # shared by all phases with a single ancilla MPS; only the tag changes
+        self.mps_info = AncillaMPSInfo(self.n_physical_sites, self.hamil.vacuum,
+                                       self.target, self.hamil.basis)
 
         if save_fcidump is not None:
             self.fcidump.orb_sym = VectorUInt8(orb_sym)
@@ -140,12 +165,11 @@ class FTDMRG:
     def generate_initial_mps(self, bond_dim):
         if self.verbose >= 2:
             print('>>> START generate initial mps <<<')
-        t = time.perf_counter()
+        t = time.perf_counter() if self.verbose >= 2 else 0.0
         assert self.hamil is not None
 
         # Ancilla MPSInfo (thermal)
-        mps_info_thermal = AncillaMPSInfo(self.n_physical_sites, self.hamil.vacuum,
-                                          self.target, self.hamil.basis)
+        mps_info_thermal = self.mps_info
         mps_info_thermal.set_thermal_limit()
         mps_info_thermal.tag = "INIT"
         mps_info_thermal.save_mutable()
@@ -169,7 +193,6 @@ class FTDMRG:
         mps_info_thermal.deallocate_mutable()
 
         mps_thermal.save_data()
-        mps_info_thermal.deallocate()
 
         if self.verbose >= 2:
             print('>>> COMPLETE generate initial mps | Time = %.2f <<<' %
@@ -179,34 +202,44 @@ class FTDMRG:
                                  method=TETypes.RK4, n_sub_sweeps=4, cont=False):
         if self.verbose >= 2:
             print('>>> START imaginary time evolution <<<')
-        t = time.perf_counter()
+        t = time.perf_counter() if self.verbose >= 2 else 0.0
 
         self.hamil.mu = mu
 
         # Ancilla MPSInfo (initial)
-        mps_info = AncillaMPSInfo(self.n_physical_sites, self.hamil.vacuum,
-                                  self.target, self.hamil.basis)
-        mps_info.tag = "INIT" if not cont else "FINAL"
-        mps_info.load_mutable()
+        mps_info = self.mps_info
+        if cont:
+            # FINAL is already on disk and nothing needs to be copied;
+            # the environments load the mutables they need themselves
+            mps_info.tag = "FINAL"
+            mps = MPS(mps_info)
+            mps.load_data()
+        else:
+            mps_info.tag = "INIT"
+            mps_info.load_mutable()
 
-        # Ancilla MPS (initial)
-        mps = MPS(mps_info)
-        mps.load_data()
-        mps.load_mutable()
+            # Ancilla MPS (initial)
+            mps = MPS(mps_info)
+            mps.load_data()
+            mps.load_mutable()
 
-        # MPS/MPSInfo save mutable
-        if not cont:
+            # MPS/MPSInfo save mutable
             mps_info.tag = "FINAL"
             mps_info.save_mutable()
             mps.save_mutable()
-        mps.deallocate()
-        mps_info.deallocate_mutable()
+            mps.deallocate()
+            mps_info.deallocate_mutable()
 
         # MPO
-        tx = time.perf_counter()
-        mpo = MPOQC(self.hamil, QCTypes.Conventional)
-        mpo = SimplifiedMPO(AncillaMPO(mpo), RuleQC(), True, True,
-                            OpNamesSet((OpNames.R, OpNames.RD)))
+        tx = time.perf_counter() if self.verbose >= 2 else 0.0
+        mpo = self._get_cached_mpo(("TE", mu))
+        if mpo is None:
+            # only one TE MPO is kept: release the one for the old mu
+            self._release_cached_mpos("TE")
+            mpo = MPOQC(self.hamil, QCTypes.Conventional)
+            mpo = SimplifiedMPO(AncillaMPO(mpo), RuleQC(), True, True,
+                                OpNamesSet((OpNames.R, OpNames.RD)))
+            self.mpo_cache.append((("TE", mu), mpo))
         if self.verbose >= 2:
             print('MPO time = ', time.perf_counter() - tx)
 
@@ -214,18 +247,19 @@ class FTDMRG:
         me = MovingEnvironment(mpo, mps, mps, "TE")
         me.delayed_contraction = OpNamesSet.normal_ops()
         me.cached_contraction = True
-        tx = time.perf_counter()
+        tx = time.perf_counter() if self.verbose >= 2 else 0.0
         me.init_environments(self.verbose >= 3)
         if self.verbose >= 2:
             print('TE INIT time = ', time.perf_counter() - tx)
-        te = TimeEvolution(me, VectorUBond(bond_dims), method, n_sub_sweeps)
+        bd_key = tuple(bond_dims)
+        if bd_key not in self.bond_dims_cache:
+            self.bond_dims_cache[bd_key] = VectorUBond(bond_dims)
+        te = TimeEvolution(me, self.bond_dims_cache[bd_key], method, n_sub_sweeps)
         te.iprint = self.verbose
         te.solve(n_steps, beta_step, mps.center == 0)
 
         self.bond_dim = bond_dims[-1]
         mps.save_data()
-        mpo.deallocate()
-        mps_info.deallocate()
 
         if self.verbose >= 2:
             print('>>> COMPLETE imaginary time evolution | Time = %.2f <<<' %
@@ -234,7 +268,7 @@ class FTDMRG:
     def decompression(self, bond_dim):
         if self.verbose >= 2:
             print('>>> START decompression <<<')
-        t = time.perf_counter()
+        t = time.perf_counter() if self.verbose >= 2 else 0.0
 
         # Ancilla MPSInfo (thermal)
         mps_info_thermal = AncillaMPSInfo(self.n_physical_sites, self.hamil.vacuum,
@@ -310,20 +344,20 @@ class FTDMRG:
     def get_one_npc(self, ridx=None):
         if self.verbose >= 2:
             print('>>> START one-npc <<<')
-        t = time.perf_counter()
+        t = time.perf_counter() if self.verbose >= 2 else 0.0
 
         self.hamil.mu = 0.0
 
         # Ancilla MPSInfo (final)
-        mps_info = AncillaMPSInfo(self.n_physical_sites, self.hamil.vacuum,
-                                  self.target, self.hamil.basis)
+        mps_info = self.mps_info
         mps_info.tag = "FINAL"
 
         # Ancilla MPS (final)
         mps = MPS(mps_info)
         mps.load_data()
 
-        # 1NPC MPO
+        # 1NPC MPO (cached MPOs are not needed here)
+        self._release_cached_mpos()
         pmpo = NPC1MPOQC(self.hamil)
         pmpo = AncillaMPO(pmpo, True)
         pmpo = SimplifiedMPO(pmpo, Rule())
@@ -350,7 +384,6 @@ class FTDMRG:
         mps.save_data()
         dmr.deallocate()
         pmpo.deallocate()
-        mps_info.deallocate()
 
         if self.verbose >= 2:
             print('>>> COMPLETE one-npc | Time = %.2f <<<' %
@@ -369,23 +402,26 @@ class FTDMRG:
     def get_one_pdm(self, ridx=None):
         if self.verbose >= 2:
             print('>>> START one-pdm <<<')
-        t = time.perf_counter()
+        t = time.perf_counter() if self.verbose >= 2 else 0.0
 
         self.hamil.mu = 0.0
 
         # Ancilla MPSInfo (final)
-        mps_info = AncillaMPSInfo(self.n_physical_sites, self.hamil.vacuum,
-                                  self.target, self.hamil.basis)
+        mps_info = self.mps_info
         mps_info.tag = "FINAL"
 
         # Ancilla MPS (final)
         mps = MPS(mps_info)
         mps.load_data()
 
-        # 1PDM MPO
-        pmpo = PDM1MPOQC(self.hamil)
-        pmpo = AncillaMPO(pmpo, True)
-        pmpo = SimplifiedMPO(pmpo, RuleQC())
+        # 1PDM MPO (the TE MPO is not needed here)
+        self._release_cached_mpos("TE")
+        pmpo = self._get_cached_mpo(("1PDM", ))
+        if pmpo is None:
+            pmpo = PDM1MPOQC(self.hamil)
+            pmpo = AncillaMPO(pmpo, True)
+            pmpo = SimplifiedMPO(pmpo, RuleQC())
+            self.mpo_cache.append((("1PDM", ), pmpo))
 
         # 1PDM
         pme = MovingEnvironment(pmpo, mps, mps, "1PDM")
@@ -395,10 +431,10 @@ class FTDMRG:
         expect.solve(True, mps.center == 0)
         if SpinLabel == SU2:
             dmr = expect.get_1pdm_spatial(self.n_physical_sites)
-            dm = np.array(dmr).copy()
+            dm = np.array(dmr)
         else:
             dmr = expect.get_1pdm(self.n_physical_sites)
-            dm = np.array(dmr).copy()
+            dm = np.array(dmr)
             dm = dm.reshape((self.n_physical_sites, 2,
                              self.n_physical_sites, 2))
             dm = np.transpose(dm, (0, 2, 1, 3))
@@ -408,15 +444,14 @@ class FTDMRG:
 
         mps.save_data()
         dmr.deallocate()
-        pmpo.deallocate()
-        mps_info.deallocate()
 
         if self.verbose >= 2:
             print('>>> COMPLETE one-pdm | Time = %.2f <<<' %
                   (time.perf_counter() - t))
 
         if SpinLabel == SU2:
-            return np.concatenate([dm[None, :, :], dm[None, :, :]], axis=0) / 2
+            dm *= 0.5
+            return np.broadcast_to(dm[None, :, :], (2, ) + dm.shape).copy()
         else:
             return np.concatenate([dm[None, :, :, 0, 0], dm[None, :, :, 1, 1]], axis=0)
 
@@ -428,7 +463,7 @@ class FTDMRG:
     def get_two_pdm(self, ridx=None):
         if self.verbose >= 2:
             print('>>> START two-pdm <<<')
-        t = time.perf_counter()
+        t = time.perf_counter() if self.verbose >= 2 else 0.0
 
         self.hamil.mu = 0.0
 
@@ -436,15 +471,15 @@ class FTDMRG:
         assert SpinLabel == SZ
 
         # Ancilla MPSInfo (final)
-        mps_info = AncillaMPSInfo(self.n_physical_sites, self.hamil.vacuum,
-                                  self.target, self.hamil.basis)
+        mps_info = self.mps_info
         mps_info.tag = "FINAL"
 
         # Ancilla MPS (final)
         mps = MPS(mps_info)
         mps.load_data()
 
-        # 2PDM MPO
+        # 2PDM MPO (cached MPOs are not needed here)
+        self._release_cached_mpos()
         pmpo = PDM2MPOQC(self.hamil, "PHQC", mask=PDM2MPOQC.s_minimal)
         pmpo = AncillaMPO(pmpo, True)
         pmpo = SimplifiedMPO(pmpo, RuleQC())
@@ -468,7 +503,6 @@ class FTDMRG:
 
         mps.save_data()
         pmpo.deallocate()
-        mps_info.deallocate()
 
         if self.verbose >= 2:
             print('>>> COMPLETE two-pdm | Time = %.2f <<<' %
@@ -477,7 +511,25 @@ class FTDMRG:
         return np.concatenate([dm[None, :, :, :, :, 0, 0, 0, 0], dm[None, :, :, :, :, 0, 1, 1, 0],
                                dm[None, :, :, :, :, 1, 1, 1, 1]], axis=0)
 
+    def _get_cached_mpo(self, key):
+        for k, mpo in self.mpo_cache:
+            if k == key:
+                return mpo
+        return None
+
+    def _release_cached_mpos(self, kind=None):
+        """Deallocate cached MPOs newest first, down to the oldest one of
+        the given kind (all cached MPOs if kind is None)."""
+        ik = [i for i, (k, _) in enumerate(self.mpo_cache)
+              if kind is None or k[0] == kind]
+        n_keep = ik[0] if len(ik) != 0 else len(self.mpo_cache)
+        while len(self.mpo_cache) > n_keep:
+            self.mpo_cache.pop()[1].deallocate()
+
     def __del__(self):
+        self._release_cached_mpos()
+        if self.mps_info is not None:
+            self.mps_info.deallocate()
         if self.hamil is not None:
             self.hamil.deallocate()
         if self.fcidump is not None:
@@ -497,6 +549,8 @@ if __name__ == "__main__":
     hf_type = "RHF"
     mpg = 'd2h'
     pg_reorder = True
+    # UHF: always label beta orbitals separately (otherwise only if spin-polarized)
+    recheck = False
     scratch = '/central/scratch/hczhai/hchain'
     scratch = './nodex'
     scratch = '/scratch/local/hczhai/hchain'
@@ -506,7 +560,10 @@ if __name__ == "__main__":
         os.mkdir(scratch)
     os.environ['TMPDIR'] = scratch
 
-    from pyscf import gto, scf, symm, ao2mo
+    from pyscf import gto, scf, symm, ao2mo, lib
+
+    # OpenMP threads for the PySCF SCF and ao2mo integral transform
+    lib.num_threads(n_threads)
 
     # H chain
     N = 8
@@ -526,6 +583,8 @@ if __name__ == "__main__":
         optimal_reorder = ["A"]
     else:
         raise FTDMRGError("Point group %d not supported yet!" % pg)
+    fcidump_sym_idx = {s: i + 1 for i, s in enumerate(fcidump_sym)}
+    optimal_reorder_idx = {s: i for i, s in enumerate(optimal_reorder)}
 
     if hf_type == "RHF":
         # SCF
@@ -535,22 +594,28 @@ if __name__ == "__main__":
         n_ao = mo_coeff.shape[0]
         n_mo = mo_coeff.shape[1]
 
-        orb_sym_str = symm.label_orb_symm(
-            mol, mol.irrep_name, mol.symm_orb, mo_coeff)
-        orb_sym = np.array([fcidump_sym.index(i) + 1 for i in orb_sym_str])
+        if pg == 'c1':
+            # single irrep, no labeling or reordering needed
+            orb_sym = np.ones(n_mo, dtype=np.int32)
+        else:
+            orb_sym_str = symm.label_orb_symm(
+                mol, mol.irrep_name, mol.symm_orb, mo_coeff)
+            orb_sym = np.fromiter((fcidump_sym_idx[i] for i in orb_sym_str),
+                                  dtype=np.int32, count=n_mo)
 
         # Sort the orbitals by symmetry for more efficient DMRG
-        if pg_reorder:
-            idx = np.argsort([optimal_reorder.index(i) for i in orb_sym_str])
+        if pg_reorder and pg != 'c1':
+            idx = np.argsort(np.fromiter((optimal_reorder_idx[i] for i in orb_sym_str),
+                                         dtype=np.int32, count=n_mo), kind='stable')
             orb_sym = orb_sym[idx]
             mo_coeff = mo_coeff[:, idx]
             ridx = np.argsort(idx)
         else:
-            ridx = np.array(list(range(n_mo)), dtype=int)
+            ridx = np.arange(n_mo)
 
         h1e = mo_coeff.T @ m.get_hcore() @ mo_coeff
-        g2e = ao2mo.restore(8, ao2mo.kernel(mol, mo_coeff), n_mo)
-        ecore = mol.energy_nuc()
+        g2e = ao2mo.restore(8, ao2mo.full(
+            mol, mo_coeff, aosym='s4', compact=True), n_mo)
         ecore = 0.0
 
     elif hf_type == "UHF":
@@ -562,21 +627,31 @@ if __name__ == "__main__":
         n_ao = mo_coeff_a.shape[0]
         n_mo = mo_coeff_b.shape[1]
 
-        orb_sym_str_a = symm.label_orb_symm(
-            mol, mol.irrep_name, mol.symm_orb, mo_coeff_a)
-        orb_sym_str_b = symm.label_orb_symm(
-            mol, mol.irrep_name, mol.symm_orb, mo_coeff_b)
-        orb_sym_a = np.array([fcidump_sym.index(i) + 1 for i in orb_sym_str_a])
-        orb_sym_b = np.array([fcidump_sym.index(i) + 1 for i in orb_sym_str_b])
+        if pg == 'c1':
+            # single irrep, no labeling or reordering needed
+            orb_sym_a = orb_sym_b = np.ones(n_mo, dtype=np.int32)
+        else:
+            orb_sym_str_a = symm.label_orb_symm(
+                mol, mol.irrep_name, mol.symm_orb, mo_coeff_a)
+            # spin-unpolarized orbitals share the alpha labels
+            if recheck or np.linalg.norm(mo_coeff_a - mo_coeff_b) > 1E-8:
+                orb_sym_str_b = symm.label_orb_symm(
+                    mol, mol.irrep_name, mol.symm_orb, mo_coeff_b)
+            else:
+                orb_sym_str_b = orb_sym_str_a
+            orb_sym_a = np.fromiter((fcidump_sym_idx[i] for i in orb_sym_str_a),
+                                    dtype=np.int32, count=n_mo)
+            orb_sym_b = np.fromiter((fcidump_sym_idx[i] for i in orb_sym_str_b),
+                                    dtype=np.int32, count=n_mo)
 
         # Sort the orbitals by symmetry for more efficient DMRG
-        if pg_reorder:
-            idx_a = np.argsort([optimal_reorder.index(i)
-                                for i in orb_sym_str_a])
+        if pg_reorder and pg != 'c1':
+            idx_a = np.argsort(np.fromiter((optimal_reorder_idx[i] for i in orb_sym_str_a),
+                                           dtype=np.int32, count=n_mo), kind='stable')
             orb_sym_a = orb_sym_a[idx_a]
             mo_coeff_a = mo_coeff_a[:, idx_a]
-            idx_b = np.argsort([optimal_reorder.index(i)
-                                for i in orb_sym_str_b])
+            idx_b = np.argsort(np.fromiter((optimal_reorder_idx[i] for i in orb_sym_str_b),
+                                           dtype=np.int32, count=n_mo), kind='stable')
             orb_sym_b = orb_sym_b[idx_b]
             mo_coeff_b = mo_coeff_b[:, idx_b]
             assert np.allclose(idx_a, idx_b)
@@ -585,17 +660,18 @@ if __name__ == "__main__":
             ridx = np.argsort(idx_a)
         else:
             orb_sym = orb_sym_a
-            ridx = np.array(list(range(n_mo)), dtype=int)
+            ridx = np.arange(n_mo)
 
         h1ea = mo_coeff_a.T @ m.get_hcore() @ mo_coeff_a
         h1eb = mo_coeff_b.T @ m.get_hcore() @ mo_coeff_b
-        g2eaa = ao2mo.restore(8, ao2mo.kernel(mol, mo_coeff_a), n_mo)
-        g2ebb = ao2mo.restore(8, ao2mo.kernel(mol, mo_coeff_b), n_mo)
-        g2eab = ao2mo.kernel(
-            mol, [mo_coeff_a, mo_coeff_a, mo_coeff_b, mo_coeff_b])
+        g2eaa = ao2mo.restore(8, ao2mo.full(
+            mol, mo_coeff_a, aosym='s4', compact=True), n_mo)
+        g2ebb = ao2mo.restore(8, ao2mo.full(
+            mol, mo_coeff_b, aosym='s4', compact=True), n_mo)
+        g2eab = ao2mo.general(
+            mol, [mo_coeff_a, mo_coeff_a, mo_coeff_b, mo_coeff_b], aosym='s4', compact=True)
         h1e = (h1ea, h1eb)
         g2e = (g2eaa, g2ebb, g2eab)
-        ecore = mol.energy_nuc()
         ecore = 0.0
 
     ft = FTDMRG(scratch=scratch, memory=10E9, verbose=2, omp_threads=n_threads)